@@ -47,7 +47,7 @@ class EngineBase:
 
     def pickle(self, obj):
         try:
-            return pickle.dumps(obj)
+            return pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
         except Exception as e:
             self.log.error(f"Error serializing object: {obj}: {e}")
             self.log.trace(traceback.format_exc())
@@ -215,13 +215,15 @@ class EngineClient(EngineBase):
         Send a cancel message and wait for confirmation from the server
         """
         # -1 == special "cancel" signal
-        message = pickle.dumps({"c": -1})
+        message = self.pickle({"c": -1})
+        if message is error_sentinel:
+            return
         await self._infinite_retry(socket.send, message)
         while 1:
             response = await self._infinite_retry(
                 socket.recv, _context=f"waiting for CANCEL_OK from {context}", _max_retries=4
             )
-            response = pickle.loads(response)
+            response = self.unpickle(response)
             if isinstance(response, dict):
                 response = response.get("m", "")
                 if response == "CANCEL_OK":
@@ -230,13 +232,15 @@ class EngineClient(EngineBase):
     async def send_shutdown_message(self):
         async with self.new_socket() as socket:
             # -99 == special shutdown message
-            message = pickle.dumps({"c": -99})
+            message = self.pickle({"c": -99})
+            if message is error_sentinel:
+                return
             with suppress(TimeoutError, asyncio.exceptions.TimeoutError):
                 await asyncio.wait_for(socket.send(message), 0.5)
             with suppress(TimeoutError, asyncio.exceptions.TimeoutError):
                 while 1:
                     response = await asyncio.wait_for(socket.recv(), 0.5)
-                    response = pickle.loads(response)
+                    response = self.unpickle(response)
                     if isinstance(response, dict):
                         response = response.get("m", "")
                         if response == "SHUTDOWN_OK":
@@ -257,7 +261,7 @@ class EngineClient(EngineBase):
             message["a"] = args
         if kwargs:
             message["k"] = kwargs
-        return pickle.dumps(message)
+        return self.pickle(message)
 
     @property
     def available_commands(self):
@@ -299,7 +303,15 @@ class EngineClient(EngineBase):
                 future = asyncio.run_coroutine_threadsafe(engine_server.worker(), loop)
                 future.result()
             else:
-                asyncio.run(engine_server.worker())
+                run = asyncio.run
+                if server_class.UVLOOP:
+                    # the engine runs in its own process, so this doesn't affect the main event loop
+                    # (uvloop isn't available on Windows)
+                    with suppress(ImportError):
+                        import uvloop
+
+                        run = uvloop.run
+                run(engine_server.worker())
         except (asyncio.CancelledError, KeyboardInterrupt, CancelledError):
             return
         except Exception:
@@ -375,6 +387,8 @@ class EngineServer(EngineBase):
     """
 
     CMDS = {}
+    # run the server process on uvloop, if it's installed
+    UVLOOP = False
 
     def __init__(self, socket_path, debug=False):
         self.name = f"EngineServer {self.__class__.__name__}"
@@ -472,7 +486,9 @@ class EngineServer(EngineBase):
 
     async def send_socket_multipart(self, client_id, message):
         try:
-            message = pickle.dumps(message)
+            message = self.pickle(message)
+            if message is error_sentinel:
+                return
             await self._infinite_retry(self.socket.send_multipart, [client_id, message])
         except Exception as e:
             self.log.verbose(f"{self.name}: error sending ZMQ message: {e}")
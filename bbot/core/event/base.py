@@ -163,6 +163,7 @@ class BaseEvent:
         self._hash = None
         self._data = None
         self.__host = None
+        self._host_str = None
         self._tags = set()
         self._port = None
         self._omit = False
@@ -278,6 +279,7 @@ class BaseEvent:
         self._data_hash = None
         self._id = None
         self.__host = None
+        self._host_str = None
         self._port = None
         self._data = data
 
@@ -331,6 +333,21 @@ class BaseEvent:
         if self._host_original is None:
             self._host_original = host
         self.__host = host
+        self._host_str = None
+
+    @property
+    def host_str(self):
+        """
+        The event's host as a string, e.g. "evilcorp.com" or "1.2.3.4"
+
+        Cached, since `host` is often an `ipaddress` object that would otherwise be converted on every use.
+        """
+        if self._host_str is None:
+            host = self.host
+            if host is None:
+                return None
+            self._host_str = str(host)
+        return self._host_str
 
     @property
     def host_original(self):
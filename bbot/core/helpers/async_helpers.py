@@ -23,6 +23,7 @@ class ShuffleQueue(asyncio.Queue):
 class _Lock(asyncio.Lock):
     def __init__(self, name):
         self.name = name
+        self.users = 0
         super().__init__()
 
 
@@ -36,16 +37,27 @@ class NamedLock:
 
     def __init__(self, max_size=10000):
         self._cache = LRUCache(maxsize=max_size)
+        # locks that are held or waited on, which must survive being evicted from the LRU
+        self._active = {}
 
     @asynccontextmanager
     async def lock(self, name):
+        lock = self._active.get(name, None)
+        if lock is None:
+            try:
+                lock = self._cache[name]
+            except KeyError:
+                lock = _Lock(name)
+                self._cache[name] = lock
+            self._active[name] = lock
+        lock.users += 1
         try:
-            lock = self._cache[name]
-        except KeyError:
-            lock = _Lock(name)
-            self._cache[name] = lock
-        async with lock:
-            yield
+            async with lock:
+                yield
+        finally:
+            lock.users -= 1
+            if lock.users == 0:
+                self._active.pop(name, None)
 
 
 class TaskCounter:
@@ -109,7 +121,17 @@ def async_to_sync_gen(async_gen):
 
 
 def async_cachedmethod(cache, key=keys.hashkey):
+    """
+    Like cachetools' `cachedmethod()`, but for async methods.
+
+    Concurrent calls with the same key are coalesced: the first one runs the method,
+    and the rest wait for its result instead of running it again.
+    """
+
     def decorator(method):
+        # futures for calls that are currently running, keyed by (instance, cache key)
+        pending = {}
+
         async def wrapper(self, *args, **kwargs):
             method_cache = cache(self)
             k = key(*args, **kwargs)
@@ -117,11 +139,37 @@ def async_cachedmethod(cache, key=keys.hashkey):
                 return method_cache[k]
             except KeyError:
                 pass
-            ret = await method(self, *args, **kwargs)
+
+            pending_key = (id(self), k)
+            future = pending.get(pending_key, None)
+            if future is not None:
+                try:
+                    return await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    # if the call we were waiting on was cancelled (but we weren't), try again ourselves
+                    if future.cancelled():
+                        return await wrapper(self, *args, **kwargs)
+                    raise
+
+            future = asyncio.get_running_loop().create_future()
+            pending[pending_key] = future
+            try:
+                ret = await method(self, *args, **kwargs)
+            except Exception as e:
+                future.set_exception(e)
+                # mark the exception as retrieved, since we're raising it ourselves
+                future.exception()
+                raise
+            except BaseException:
+                future.cancel()
+                raise
+            finally:
+                pending.pop(pending_key, None)
             try:
                 method_cache[k] = ret
             except ValueError:
                 pass
+            future.set_result(ret)
             return ret
 
         return functools.wraps(method)(wrapper)
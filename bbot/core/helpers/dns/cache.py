@@ -0,0 +1,87 @@
+import time
+from cachetools import LRUCache
+
+
+class DNSCache:
+    """
+    A size-limited LRU cache for DNS answers that honors record TTLs.
+
+    Each entry expires once the minimum TTL of its answer has passed (capped at `max_ttl`).
+    Empty results (e.g. NXDOMAIN) have no TTL of their own, so they are cached for `error_ttl` seconds.
+    A TTL of 0 means the entry isn't cached at all.
+
+    Expired entries are kept around for another `stale_ttl` seconds so they can be served
+    with `get_stale()` while a fresh answer is fetched in the background.
+
+    Examples:
+        >>> cache = DNSCache(maxsize=10000, max_ttl=86400, error_ttl=0, stale_ttl=300)
+        >>> cache[hash(("evilcorp.com", "A"))] = answer
+        >>> cache.get(hash(("evilcorp.com", "A")))
+        <dns.resolver.Answer object at 0x7f4a47cdb1d0>
+    """
+
+    def __init__(self, maxsize=10000, max_ttl=86400, error_ttl=0, stale_ttl=0):
+        self.max_ttl = max_ttl
+        self.error_ttl = error_ttl
+        self.stale_ttl = stale_ttl
+        self._cache = LRUCache(maxsize=maxsize)
+
+    def get(self, key, default=None):
+        """
+        Get an unexpired entry from the cache
+        """
+        entry = self._get(key)
+        if entry is None or entry[1] <= 0:
+            return default
+        return entry[0]
+
+    def get_stale(self, key, default=None):
+        """
+        Get an entry that has expired, but is still within the stale window
+        """
+        entry = self._get(key)
+        if entry is None or entry[1] > 0:
+            return default
+        return entry[0]
+
+    def _get(self, key):
+        """
+        Returns a tuple of (results, seconds_until_expiration), or None if there's no usable entry
+        """
+        try:
+            results, expires = self._cache[key]
+        except KeyError:
+            return None
+        remaining = expires - time.monotonic()
+        if remaining <= -self.stale_ttl:
+            self._cache.pop(key, None)
+            return None
+        return results, remaining
+
+    def __setitem__(self, key, results):
+        ttl = self.ttl(results)
+        if ttl > 0:
+            self._cache[key] = (results, time.monotonic() + ttl)
+        else:
+            self._cache.pop(key, None)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self._cache)
+
+    def ttl(self, results):
+        """
+        Get the number of seconds a result should be cached for, based on the TTLs of its records
+        """
+        if not results:
+            return self.error_ttl
+        # dnspython answers carry an absolute expiration based on the minimum TTL in the response
+        expiration = getattr(results, "expiration", None)
+        if expiration is None:
+            return self.max_ttl
+        return min(expiration - time.time(), self.max_ttl)
+
+    def clear(self):
+        self._cache.clear()
@@ -3,12 +3,11 @@ import logging
 import dns.exception
 import dns.asyncresolver
 from cachetools import LFUCache
-from radixtarget import RadixTarget
 
 from bbot.errors import DNSError
 from bbot.core.engine import EngineClient
 from bbot.core.helpers.async_helpers import async_cachedmethod
-from ..misc import clean_dns_record, is_ip, is_domain, is_dns_name
+from ..misc import clean_dns_record, grouper, is_ip, is_domain, is_dns_name
 
 from .engine import DNSEngine
 
@@ -34,10 +33,10 @@ class DNSHelper(EngineClient):
         abort_threshold (int): The threshold for aborting after consecutive failed queries. Defaults to 50.
         runaway_limit (int): Maximum allowed distance for consecutive DNS resolutions. Defaults to 5.
         all_rdtypes (list): A list of DNS record types to be considered during operations.
-        wildcard_ignore (tuple): Domains to be ignored during wildcard detection.
+        wildcard_ignore (set): Domains to be ignored during wildcard detection.
         wildcard_tests (int): Number of tests to be run for wildcard detection. Defaults to 5.
         _wildcard_cache (dict): Cache for wildcard detection results.
-        _dns_cache (LRUCache): Cache for DNS resolution results, limited in size.
+        _dns_cache (DNSCache): Cache for DNS resolution results, limited in size and expired according to record TTLs.
         resolver_file (Path): File containing system's current resolver nameservers.
         filter_bad_ptrs (bool): Whether to filter out DNS names that appear to be auto-generated PTR records. Defaults to True.
 
@@ -70,9 +69,7 @@ class DNSHelper(EngineClient):
 
         # wildcard handling
         self.wildcard_disable = self.dns_config.get("wildcard_disable", False)
-        self.wildcard_ignore = RadixTarget()
-        for d in self.dns_config.get("wildcard_ignore", []):
-            self.wildcard_ignore.insert(d)
+        self.wildcard_ignore = {clean_dns_record(d) for d in self.dns_config.get("wildcard_ignore", [])}
 
         # copy the system's current resolvers to a text file for tool use
         self.system_resolvers = dns.resolver.Resolver().nameservers
@@ -82,6 +79,9 @@ class DNSHelper(EngineClient):
         # brute force helper
         self._brute = None
 
+        # batch queries are sent to the engine in chunks of this size
+        self.batch_size = 512
+
         self._is_wildcard_cache = LFUCache(maxsize=1000)
         self._is_wildcard_domain_cache = LFUCache(maxsize=1000)
 
@@ -92,22 +92,16 @@ class DNSHelper(EngineClient):
         return await self.run_and_return("resolve_raw", query=query, **kwargs)
 
     async def resolve_batch(self, queries, **kwargs):
-        agen = self.run_and_yield("resolve_batch", queries=queries, **kwargs)
-        while 1:
-            try:
-                yield await agen.__anext__()
-            except (StopAsyncIteration, GeneratorExit):
-                await agen.aclose()
-                break
+        for chunk in grouper(queries, self.batch_size):
+            results = await self.run_and_return("resolve_batch_chunk", queries=chunk, **kwargs)
+            for result in results or []:
+                yield result
 
     async def resolve_raw_batch(self, queries):
-        agen = self.run_and_yield("resolve_raw_batch", queries=queries)
-        while 1:
-            try:
-                yield await agen.__anext__()
-            except (StopAsyncIteration, GeneratorExit):
-                await agen.aclose()
-                break
+        for chunk in grouper(queries, self.batch_size):
+            results = await self.run_and_return("resolve_raw_batch_chunk", queries=chunk)
+            for result in results or []:
+                yield result
 
     @property
     def brute(self):
@@ -187,10 +181,16 @@ class DNSHelper(EngineClient):
             return False
 
         # skip check if the query's parent domain is excluded in the config
-        wildcard_ignore = self.wildcard_ignore.search(host)
-        if wildcard_ignore:
-            log.debug(f"Skipping wildcard detection on {host} because {wildcard_ignore} is excluded in the config")
-            return False
+        # walk up from the host itself, so the most specific match wins
+        wildcard_ignore = host
+        while 1:
+            if wildcard_ignore in self.wildcard_ignore:
+                log.debug(f"Skipping wildcard detection on {host} because {wildcard_ignore} is excluded in the config")
+                return False
+            dot = wildcard_ignore.find(".")
+            if dot == -1:
+                break
+            wildcard_ignore = wildcard_ignore[dot + 1 :]
 
         return host
 
@@ -4,15 +4,17 @@ import time
 import asyncio
 import logging
 import traceback
-from cachetools import LRUCache
 from contextlib import suppress
 
 from bbot.core.engine import EngineServer
 from bbot.core.helpers.async_helpers import NamedLock
+from bbot.core.helpers.dns.cache import DNSCache
+from bbot.core.helpers.dns.resolver import BBOTAsyncResolver
 from bbot.core.helpers.dns.helpers import extract_targets
 from bbot.core.helpers.misc import (
     is_ip,
     rand_string,
+    cancel_tasks,
     parent_domain,
     domain_parents,
 )
@@ -32,8 +34,12 @@ class DNSEngine(EngineServer):
         3: "resolve_raw_batch",
         4: "is_wildcard",
         5: "is_wildcard_domain",
+        6: "resolve_batch_chunk",
+        7: "resolve_raw_batch_chunk",
         99: "_mock_dns",
     }
+    # nearly all of the DNS engine's time is spent in the event loop
+    UVLOOP = True
 
     def __init__(self, socket_path, config={}, debug=False):
         super().__init__(socket_path, debug=debug)
@@ -46,10 +52,11 @@ class DNSEngine(EngineServer):
         self.abort_threshold = self.dns_config.get("abort_threshold", 50)
 
         # resolver
-        self.resolver = dns.asyncresolver.Resolver()
-        self.resolver.rotate = True
-        self.resolver.timeout = self.timeout
-        self.resolver.lifetime = self.timeout
+        self.resolver = BBOTAsyncResolver(
+            timeout=self.timeout,
+            race_delay=self.dns_config.get("race_delay", 0.15),
+            udp_sockets=self.dns_config.get("udp_sockets", 16),
+        )
 
         # skip certain queries
         dns_omit_queries = self.dns_config.get("omit_queries", None)
@@ -68,10 +75,7 @@ class DNSEngine(EngineServer):
                     self.dns_omit_queries[rdtype] = {query}
 
         # wildcard handling
-        self.wildcard_ignore = self.dns_config.get("wildcard_ignore", None)
-        if not self.wildcard_ignore:
-            self.wildcard_ignore = []
-        self.wildcard_ignore = tuple([str(d).strip().lower() for d in self.wildcard_ignore])
+        # (wildcard_ignore is applied by DNSHelper before queries ever reach the engine)
         self.wildcard_tests = self.dns_config.get("wildcard_tests", 5)
         self._wildcard_cache = dict()
         # since wildcard detection takes some time, This is to prevent multiple
@@ -85,7 +89,15 @@ class DNSEngine(EngineServer):
         self._dns_warnings = set()
         self._errors = dict()
         self._debug = self.dns_config.get("debug", False)
-        self._dns_cache = LRUCache(maxsize=10000)
+        # DNS answers are cached according to their TTLs
+        self._dns_cache = DNSCache(
+            maxsize=10000,
+            max_ttl=self.dns_config.get("cache_max_ttl", 86400),
+            error_ttl=self.dns_config.get("cache_error_ttl", 0),
+            stale_ttl=self.dns_config.get("cache_stale_ttl", 300),
+        )
+        # background tasks refreshing stale cache entries
+        self._dns_cache_refreshes = dict()
 
         self.filter_bad_ptrs = self.dns_config.get("filter_ptrs", True)
 
@@ -208,29 +220,31 @@ class DNSEngine(EngineServer):
         tries_left = int(retries) + 1
         parent_hash = hash((parent, rdtype))
         dns_cache_hash = hash((query, rdtype))
+        if use_cache:
+            cached_results = self._get_cached(dns_cache_hash, self._resolve_hostname, query, retries=retries, **kwargs)
+            if cached_results is not None:
+                self.debug(f"Got {rdtype}:{query} from cache")
+                return cached_results, errors
         while tries_left > 0:
             try:
-                if use_cache:
-                    results = self._dns_cache.get(dns_cache_hash, [])
-                if not results:
-                    error_count = self._errors.get(parent_hash, 0)
-                    if error_count >= self.abort_threshold:
-                        connectivity = await self._connectivity_check()
-                        if connectivity:
+                error_count = self._errors.get(parent_hash, 0)
+                if error_count >= self.abort_threshold:
+                    connectivity = await self._connectivity_check()
+                    if connectivity:
+                        self.log.verbose(
+                            f'Aborting query "{query}" because failed {rdtype} queries for "{parent}" ({error_count:,}) exceeded abort threshold ({self.abort_threshold:,})'
+                        )
+                        if parent_hash not in self._dns_warnings:
                             self.log.verbose(
-                                f'Aborting query "{query}" because failed {rdtype} queries for "{parent}" ({error_count:,}) exceeded abort threshold ({self.abort_threshold:,})'
+                                f'Aborting future {rdtype} queries to "{parent}" because error count ({error_count:,}) exceeded abort threshold ({self.abort_threshold:,})'
                             )
-                            if parent_hash not in self._dns_warnings:
-                                self.log.verbose(
-                                    f'Aborting future {rdtype} queries to "{parent}" because error count ({error_count:,}) exceeded abort threshold ({self.abort_threshold:,})'
-                                )
-                            self._dns_warnings.add(parent_hash)
-                            return results, errors
-                    results = await self._catch(self.resolver.resolve, query, **kwargs)
-                    if use_cache:
-                        self._dns_cache[dns_cache_hash] = results
-                    if parent_hash in self._errors:
-                        self._errors[parent_hash] = 0
+                        self._dns_warnings.add(parent_hash)
+                        return results, errors
+                results = await self._catch(self.resolver.resolve, query, **kwargs)
+                if use_cache:
+                    self._dns_cache[dns_cache_hash] = results
+                if parent_hash in self._errors:
+                    self._errors[parent_hash] = 0
                 break
             except (
                 dns.resolver.NoNameservers,
@@ -296,14 +310,16 @@ class DNSEngine(EngineServer):
         results = []
         errors = []
         dns_cache_hash = hash((query, "PTR"))
+        if use_cache:
+            cached_results = self._get_cached(dns_cache_hash, self._resolve_ip, query, retries=retries, **kwargs)
+            if cached_results is not None:
+                self.debug(f"Got PTR:{query} from cache")
+                return cached_results, errors
         while tries_left > 0:
             try:
+                results = await self._catch(self.resolver.resolve_address, query, **kwargs)
                 if use_cache:
-                    results = self._dns_cache.get(dns_cache_hash, [])
-                if not results:
-                    results = await self._catch(self.resolver.resolve_address, query, **kwargs)
-                    if use_cache:
-                        self._dns_cache[dns_cache_hash] = results
+                    self._dns_cache[dns_cache_hash] = results
                 break
             except (
                 dns.resolver.NoNameservers,
@@ -328,6 +344,43 @@ class DNSEngine(EngineServer):
 
         return results, errors
 
+    def _get_cached(self, dns_cache_hash, resolve_fn, query, **kwargs):
+        """
+        Get a result from the DNS cache.
+
+        If the entry has expired but is still within the stale window, it's returned as-is and a fresh
+        answer is fetched in the background. This keeps the upstream round-trip off the critical path
+        for names that are looked up repeatedly throughout the scan.
+
+        Args:
+            dns_cache_hash (int): The cache key.
+            resolve_fn (callable): The function used to refresh the entry, e.g. `_resolve_hostname`.
+            query (str): The hostname or IP address to refresh.
+            **kwargs: Arguments passed through to `resolve_fn`.
+
+        Returns:
+            The cached results, or None if there's no usable cache entry.
+        """
+        results = self._dns_cache.get(dns_cache_hash)
+        if results is None:
+            results = self._dns_cache.get_stale(dns_cache_hash)
+            if results is not None and dns_cache_hash not in self._dns_cache_refreshes:
+                self.debug(f"Serving stale cache entry for {query} with kwargs={kwargs} while refreshing it")
+                task = asyncio.create_task(self._refresh_cached(dns_cache_hash, resolve_fn, query, **kwargs))
+                self._dns_cache_refreshes[dns_cache_hash] = task
+                task.add_done_callback(lambda t: self._dns_cache_refreshes.pop(dns_cache_hash, None))
+        return results
+
+    async def _refresh_cached(self, dns_cache_hash, resolve_fn, query, **kwargs):
+        try:
+            results, errors = await resolve_fn(query, use_cache=False, **kwargs)
+            # on failure, keep serving the stale entry until it falls out of the stale window
+            if results or not errors:
+                self._dns_cache[dns_cache_hash] = results
+        except Exception as e:
+            self.log.verbose(f"Error refreshing DNS cache entry for {query} with kwargs={kwargs}: {e}")
+            self.log.trace(traceback.format_exc())
+
     async def resolve_batch(self, queries, threads=10, **kwargs):
         """
         A helper to execute a bunch of DNS requests.
@@ -361,6 +414,21 @@ class DNSEngine(EngineServer):
             rdtype = kwargs["type"]
             yield ((query, rdtype), (answers, errors))
 
+    async def resolve_batch_chunk(self, queries, threads=10, **kwargs):
+        """
+        Like `resolve_batch()`, but returns all the results at once as a list.
+
+        This lets `DNSHelper` resolve a whole chunk of queries in a single round trip to the engine,
+        instead of paying the IPC cost for every individual result.
+        """
+        return [r async for r in self.resolve_batch(queries, threads=threads, **kwargs)]
+
+    async def resolve_raw_batch_chunk(self, queries, threads=10, **kwargs):
+        """
+        Like `resolve_raw_batch()`, but returns all the results at once as a list.
+        """
+        return [r async for r in self.resolve_raw_batch(queries, threads=threads, **kwargs)]
+
     async def _catch(self, callback, *args, **kwargs):
         """
         Asynchronously catches exceptions thrown during DNS resolution and logs them.
@@ -473,12 +541,16 @@ class DNSEngine(EngineServer):
         # only bother to check the rdypes that actually resolve
         rdtypes_to_check = set(raw_dns_records)
 
-        # for every parent domain, starting with the shortest
         parents = list(domain_parents(query))
-        for parent in parents[::-1]:
+        if not parents:
+            wildcard_results = {}
+        else:
+            # check all the parent domains in one pass, starting with the shortest
+            # (once a wildcard is found for an rdtype, the longer parents aren't checked for it)
+            wildcard_results = await self.is_wildcard_domain(parents[0], rdtypes_to_check)
 
-            # check if the parent domain is set up with wildcards
-            wildcard_results = await self.is_wildcard_domain(parent, rdtypes_to_check)
+        # for every parent domain, starting with the shortest
+        for parent in parents[::-1]:
 
             # for every rdtype
             for rdtype in list(baseline_raw):
@@ -497,9 +569,6 @@ class DNSEngine(EngineServer):
                 wildcards, wildcard_raw = wildcards
 
                 if wildcard_raw:
-                    # skip this rdtype from now on
-                    rdtypes_to_check.remove(rdtype)
-
                     # check if any of our baseline IPs are in the wildcard results
                     is_wildcard = any(r in wildcards for r in _baseline)
                     is_wildcard_raw = any(r in wildcard_raw for r in _baseline_raw)
@@ -549,16 +618,26 @@ class DNSEngine(EngineServer):
         # and check each of them, beginning with the highest parent (i.e. the root domain)
         for i, host in enumerate(parents[::-1]):
             host_results = {}
-            queries = [((host, rdtype), {}) for rdtype in rdtypes]
+            queries = []
+            for rdtype in rdtypes:
+                # zones we've already checked are served straight from the cache,
+                # without paying for a lock and a task
+                try:
+                    results, results_raw = self._wildcard_cache[hash((host, rdtype.upper()))]
+                except KeyError:
+                    queries.append(((host, rdtype), {}))
+                    continue
+                if results_raw:
+                    host_results[rdtype] = results, results_raw
             async for ((_, rdtype), _, _), (results, results_raw) in self.task_pool(
                 self._is_wildcard_zone, args_kwargs=queries
             ):
-                # if we hit a wildcard, we can skip this rdtype from now on
                 if results_raw:
-                    rdtypes.remove(rdtype)
                     host_results[rdtype] = results, results_raw
 
             if host_results:
+                # if we hit a wildcard, we can skip this rdtype from now on
+                rdtypes.difference_update(host_results)
                 wildcard_results[host] = host_results
 
         return wildcard_results
@@ -604,10 +683,6 @@ class DNSEngine(EngineServer):
 
         return wildcard_results, wildcard_results_raw
 
-    async def _is_wildcard(self, query, rdtypes, dns_children):
-        if isinstance(rdtypes, str):
-            rdtypes = [rdtypes]
-
     @property
     def dns_connectivity_lock(self):
         if self._dns_connectivity_lock is None:
@@ -653,6 +728,13 @@ class DNSEngine(EngineServer):
     def in_tests(self):
         return os.getenv("BBOT_TESTING", "") == "True"
 
+    async def _shutdown(self):
+        # background cache refreshes would otherwise reopen the resolver's sockets after it's closed
+        await cancel_tasks(list(self._dns_cache_refreshes.values()))
+        if isinstance(self.resolver, BBOTAsyncResolver):
+            self.resolver.close()
+        await super()._shutdown()
+
     async def _mock_dns(self, mock_data, custom_lookup_fn=None):
         from .mock import MockResolver
 
@@ -0,0 +1,331 @@
+import dns
+import time
+import struct
+import asyncio
+import logging
+import dns.name
+import dns.flags
+import dns.rcode
+import dns.message
+import dns.resolver
+import dns.exception
+import dns.asyncquery
+import dns.rdatatype
+import dns.rdataclass
+import dns.reversename
+
+log = logging.getLogger("bbot.core.helpers.dns.resolver")
+
+# id, flags, qdcount, ancount, nscount, arcount
+dns_header = struct.Struct("!HHHHHH")
+
+
+class BBOTAsyncResolver:
+    """
+    A lightweight asynchronous DNS resolver.
+
+    dnspython's `dns.asyncresolver.Resolver` does a lot of per-query bookkeeping (search lists, resolver-side caching,
+    nameserver objects, backoff tracking) that BBOT doesn't need, and which becomes a bottleneck at high concurrency.
+    This resolver sends queries straight to the nameservers and only uses dnspython to build and parse messages.
+
+    It is a drop-in replacement for the parts of dnspython's resolver that BBOT uses: it returns the same
+    `dns.resolver.Answer` objects and raises the same exceptions (`NXDOMAIN`, `NoAnswer`, `NoNameservers`, `LifetimeTimeout`).
+
+    When there are multiple nameservers, they are raced Happy Eyeballs-style: if a nameserver hasn't answered
+    within `race_delay` seconds (or fails), the query is also sent to the next one. The first definitive answer wins
+    and the other queries are cancelled. This keeps a single slow or broken nameserver from stalling the query.
+
+    UDP queries go through a small pool of long-lived sockets per nameserver (`udp_sockets`), with responses
+    matched to their queries by DNS ID. This avoids creating and tearing down a socket for every query,
+    at the cost of sending from a fixed set of source ports. With `udp_sockets=0`, every query gets its own socket.
+
+    Examples:
+        >>> resolver = BBOTAsyncResolver(nameservers=["1.1.1.1", "8.8.8.8"], timeout=5)
+        >>> answer = await resolver.resolve("one.one.one.one", rdtype="A")
+        >>> [r.to_text() for r in answer]
+        ['1.1.1.1', '1.0.0.1']
+    """
+
+    def __init__(self, nameservers=None, timeout=5, port=53, race_delay=0.15, udp_sockets=16):
+        if not nameservers:
+            nameservers = dns.resolver.Resolver().nameservers
+        self.nameservers = list(nameservers)
+        self.timeout = timeout
+        self.port = port
+        self.race_delay = race_delay
+        self.udp_sockets = udp_sockets
+        self._nameserver_index = 0
+        # nameserver --> list of UDPSocket
+        self._udp_pool = dict()
+        self._udp_pool_index = dict()
+        self._udp_pool_loop = None
+
+    async def resolve(self, qname, rdtype="A", tcp=False, lifetime=None):
+        """
+        Resolve a hostname, racing the nameservers until one of them gives a definitive answer.
+
+        Args:
+            qname (str or dns.name.Name): The name to resolve.
+            rdtype (str or int, optional): The record type to query. Defaults to "A".
+            tcp (bool, optional): Whether to use TCP instead of UDP. Defaults to False.
+            lifetime (float, optional): Overall time limit for the query. Defaults to `self.timeout`.
+
+        Returns:
+            dns.resolver.Answer: The parsed answer.
+
+        Raises:
+            dns.resolver.NXDOMAIN: If the name doesn't exist.
+            dns.resolver.NoAnswer: If the name exists but has no records of the requested type.
+            dns.resolver.NoNameservers: If every nameserver failed (e.g. SERVFAIL).
+            dns.resolver.LifetimeTimeout: If no answer arrived before the lifetime expired.
+        """
+        if isinstance(qname, str):
+            qname = dns.name.from_text(qname)
+        rdtype = dns.rdatatype.RdataType.make(rdtype)
+        request = dns.message.make_query(qname, rdtype)
+        if lifetime is None:
+            lifetime = self.timeout
+        start = time.monotonic()
+        errors = []
+        nameservers = self._rotated_nameservers()
+        tasks = set()
+        try:
+            while 1:
+                remaining = lifetime - (time.monotonic() - start)
+                if remaining <= 0:
+                    break
+                # every time the previous nameserver fails or takes too long, bring in the next one
+                if nameservers:
+                    nameserver = nameservers.pop(0)
+                    coro = self._query_nameserver(request, qname, rdtype, nameserver, remaining, tcp, errors)
+                    tasks.add(asyncio.create_task(coro))
+                elif not tasks:
+                    break
+                wait_timeout = remaining
+                if nameservers and self.race_delay is not None:
+                    wait_timeout = min(self.race_delay, remaining)
+                done, tasks = await asyncio.wait(tasks, timeout=wait_timeout, return_when=asyncio.FIRST_COMPLETED)
+                negative_answer = None
+                for task in done:
+                    # NXDOMAIN, NoAnswer, etc.
+                    exception = task.exception()
+                    if exception is not None:
+                        negative_answer = exception
+                        continue
+                    answer = task.result()
+                    if answer is not None:
+                        return answer
+                if negative_answer is not None:
+                    raise negative_answer
+        finally:
+            for task in tasks:
+                task.cancel()
+        if time.monotonic() - start >= lifetime:
+            raise dns.resolver.LifetimeTimeout(timeout=time.monotonic() - start, errors=errors)
+        raise dns.resolver.NoNameservers(request=request, errors=errors)
+
+    async def resolve_address(self, ipaddr, *args, **kwargs):
+        """
+        Reverse-resolve an IP address to its PTR record(s).
+        """
+        kwargs["rdtype"] = "PTR"
+        return await self.resolve(dns.reversename.from_address(ipaddr), *args, **kwargs)
+
+    async def _query_nameserver(self, request, qname, rdtype, nameserver, timeout, tcp, errors):
+        """
+        Query a single nameserver.
+
+        Returns the answer, raises on a definitive negative response, or returns None if the nameserver failed.
+        """
+        try:
+            response = await self._query(request, nameserver, timeout=timeout, tcp=tcp)
+        except (dns.exception.DNSException, OSError, EOFError) as e:
+            errors.append((nameserver, tcp, self.port, e, None))
+            return None
+        return self._make_answer(qname, rdtype, response, nameserver, tcp, errors)
+
+    async def _query(self, request, nameserver, timeout, tcp=False):
+        if not tcp:
+            try:
+                return await self._query_udp(request, nameserver, timeout=timeout)
+            except dns.message.Truncated:
+                pass
+        return await dns.asyncquery.tcp(request, nameserver, timeout=timeout, port=self.port)
+
+    async def _query_udp(self, request, nameserver, timeout):
+        udp_socket = await self._get_udp_socket(nameserver, request)
+        if udp_socket is None:
+            # every pooled socket already has a query in flight with this ID
+            return await dns.asyncquery.udp(
+                request, nameserver, timeout=timeout, port=self.port, raise_on_truncation=True
+            )
+        try:
+            return await asyncio.wait_for(udp_socket.query(request), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise dns.exception.Timeout(timeout=timeout)
+        finally:
+            udp_socket.release(request)
+
+    async def _get_udp_socket(self, nameserver, request):
+        """
+        Pick a pooled socket for this nameserver that doesn't already have a query in flight with the same ID.
+
+        New sockets are opened until the pool is full, after which the existing ones are used round-robin.
+        The request's ID is reserved on the chosen socket before anything is awaited, so concurrent queries
+        with the same ID can never share a socket. The caller is responsible for releasing it.
+        """
+        loop = asyncio.get_running_loop()
+        if self._udp_pool_loop is not loop:
+            # sockets are bound to the event loop they were created on
+            self.close()
+            self._udp_pool_loop = loop
+        pool = self._udp_pool.setdefault(nameserver, [])
+        pool[:] = [s for s in pool if not s.closed]
+        if len(pool) < self.udp_sockets:
+            udp_socket = UDPSocket()
+            # claim the spot in the pool before awaiting, so concurrent queries don't overfill it
+            pool.append(udp_socket)
+            udp_socket.reserve(request)
+            try:
+                await loop.create_datagram_endpoint(lambda: udp_socket, remote_addr=(nameserver, self.port))
+            except BaseException:
+                udp_socket.release(request)
+                udp_socket.close()
+                raise
+            return udp_socket
+        index = self._udp_pool_index.get(nameserver, 0)
+        for i in range(len(pool)):
+            udp_socket = pool[(index + i) % len(pool)]
+            if request.id not in udp_socket.pending:
+                udp_socket.reserve(request)
+                self._udp_pool_index[nameserver] = (index + i + 1) % len(pool)
+                return udp_socket
+
+    def close(self):
+        """
+        Close all pooled sockets
+        """
+        for pool in self._udp_pool.values():
+            for udp_socket in pool:
+                udp_socket.close()
+        self._udp_pool.clear()
+        self._udp_pool_index.clear()
+
+    def _make_answer(self, qname, rdtype, response, nameserver, tcp, errors):
+        """
+        Turn a response into an Answer, raising the appropriate dnspython exception for definitive negative responses.
+
+        Returns None if the response wasn't usable and the next nameserver should be tried.
+        """
+        rcode = response.rcode()
+        if rcode == dns.rcode.NOERROR:
+            answer = dns.resolver.Answer(qname, rdtype, dns.rdataclass.IN, response, nameserver, self.port)
+            if answer.rrset is None:
+                raise dns.resolver.NoAnswer(response=response)
+            return answer
+        elif rcode == dns.rcode.NXDOMAIN:
+            raise dns.resolver.NXDOMAIN(qnames=[qname], responses={qname: response})
+        elif rcode == dns.rcode.YXDOMAIN:
+            raise dns.resolver.YXDOMAIN()
+        # SERVFAIL, REFUSED, etc.
+        errors.append((nameserver, tcp, self.port, dns.rcode.to_text(rcode), response))
+        return None
+
+    def _rotated_nameservers(self):
+        """
+        Round-robin the starting nameserver so the load is spread evenly across all of them.
+        """
+        num_nameservers = len(self.nameservers)
+        if num_nameservers == 0:
+            return []
+        start = self._nameserver_index % num_nameservers
+        self._nameserver_index = start + 1
+        return self.nameservers[start:] + self.nameservers[:start]
+
+
+class UDPSocket(asyncio.DatagramProtocol):
+    """
+    A long-lived UDP socket connected to a single nameserver.
+
+    Multiple queries can be in flight at once; responses are matched to their queries by DNS ID.
+    """
+
+    def __init__(self):
+        self.transport = None
+        self.closed = False
+        self._ready = asyncio.Event()
+        # query id --> (request, future)
+        self.pending = dict()
+
+    def reserve(self, request):
+        """
+        Claim the request's DNS ID on this socket, so no other query can use it until it's released
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request.id] = (request, future)
+
+    def release(self, request):
+        self.pending.pop(request.id, None)
+
+    async def query(self, request):
+        """
+        Send a request that has already been reserved on this socket, and wait for its response
+        """
+        _, future = self.pending[request.id]
+        if self.transport is None:
+            await self._ready.wait()
+        if self.closed:
+            raise EOFError("Socket closed")
+        self.transport.sendto(request.to_wire())
+        return await future
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self._ready.set()
+
+    def datagram_received(self, data, addr):
+        if len(data) < 12:
+            return
+        query_id, flags, _, answer_count, _, _ = dns_header.unpack_from(data)
+        try:
+            request, future = self.pending[query_id]
+        except KeyError:
+            # late response to a query that already timed out
+            return
+        if future.done():
+            return
+        truncated = flags & dns.flags.TC
+        # responses without answers (NXDOMAIN, SERVFAIL, etc.) are the bulk of the traffic when brute-forcing
+        # for those (and truncated responses), we only need the header and question, so skip parsing the rest
+        question_only = bool(truncated or answer_count == 0)
+        try:
+            response = dns.message.from_wire(data, ignore_trailing=True, question_only=question_only)
+        except Exception as e:
+            log.debug(f"Error parsing DNS response: {e}")
+            return
+        # same as dnspython, ignore responses that don't match the question
+        if not request.is_response(response):
+            return
+        if truncated:
+            future.set_exception(dns.message.Truncated(message=response))
+        else:
+            future.set_result(response)
+
+    def error_received(self, exc):
+        # e.g. ICMP port unreachable
+        self._fail_pending(exc)
+
+    def connection_lost(self, exc):
+        self.closed = True
+        self._fail_pending(exc or EOFError("Socket closed"))
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+        if self.transport is not None:
+            self.transport.close()
+
+    def _fail_pending(self, exc):
+        for request, future in self.pending.values():
+            if not future.done():
+                future.set_exception(exc)
@@ -5,6 +5,7 @@ import json
 import random
 import string
 import asyncio
+import functools
 import logging
 import ipaddress
 import regex as re
@@ -23,6 +24,31 @@ from .names_generator import random_name, names, adjectives  # noqa F401
 log = logging.getLogger("bbot.core.helpers.misc")
 
 
+def _str_lru_cache(maxsize=65536):
+    """
+    Like `functools.lru_cache`, but only caches calls whose first argument is a string.
+
+    Used for the cheap but extremely hot host validation helpers, which see the same hostnames over and over.
+    Anything else (IP objects, DNS records, bytes, etc.) is passed straight through to the original function.
+    """
+
+    def decorator(fn):
+        cached_fn = functools.lru_cache(maxsize=maxsize)(fn)
+
+        @functools.wraps(fn)
+        def wrapper(d, *args, **kwargs):
+            if type(d) is str:
+                return cached_fn(d, *args, **kwargs)
+            return fn(d, *args, **kwargs)
+
+        wrapper.cache_info = cached_fn.cache_info
+        wrapper.cache_clear = cached_fn.cache_clear
+        return wrapper
+
+    return decorator
+
+
+@_str_lru_cache()
 def is_domain(d):
     """
     Check if the given input represents a domain without subdomains.
@@ -559,6 +585,7 @@ def is_port(p):
     return p and p.isdigit() and 0 <= int(p) <= 65535
 
 
+@_str_lru_cache()
 def is_dns_name(d, include_local=True):
     """
     Determines if the given string is a valid DNS name.
@@ -591,6 +618,7 @@ def is_dns_name(d, include_local=True):
     return False
 
 
+@_str_lru_cache()
 def is_ip(d, version=None):
     """
     Checks if the given string or object represents a valid IP address.
@@ -2600,6 +2628,7 @@ async def as_completed(coros):
             yield task
 
 
+@_str_lru_cache()
 def clean_dns_record(record):
     """
     Cleans and formats a given DNS record for further processing.
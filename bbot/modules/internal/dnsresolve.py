@@ -1,7 +1,8 @@
+import asyncio
 import ipaddress
 from contextlib import suppress
 
-from bbot.errors import ValidationError
+from bbot.errors import DNSError, ValidationError
 from bbot.core.helpers.dns.engine import all_rdtypes
 from bbot.core.helpers.dns.helpers import extract_targets
 from bbot.modules.base import BaseInterceptModule, BaseModule
@@ -76,10 +77,16 @@ class DNSResolve(BaseInterceptModule):
         if not event_is_ip:
             # if the event is within our dns search distance, resolve the rest of our records
             if main_host_event.scope_distance < self._dns_search_distance:
-                await self.resolve_event(main_host_event, types=non_minimal_rdtypes)
                 # check for wildcards if the event is within the scan's search distance
                 if new_event and main_host_event.scope_distance <= self.scan.scope_search_distance:
+                    # while the rest of the records are resolving, get a head start on wildcard detection
+                    await asyncio.gather(
+                        self.resolve_event(main_host_event, types=non_minimal_rdtypes),
+                        self.prefetch_wildcards(main_host_event),
+                    )
                     await self.handle_wildcard_event(main_host_event)
+                else:
+                    await self.resolve_event(main_host_event, types=non_minimal_rdtypes)
 
         # if there weren't any DNS children and it's not an IP address, tag as unresolved
         if not main_host_event.raw_dns_records and not event_is_ip:
@@ -116,10 +123,24 @@ class DNSResolve(BaseInterceptModule):
         event.scope_distance = main_host_event.scope_distance
         event._resolved_hosts = main_host_event.resolved_hosts
 
+    async def prefetch_wildcards(self, event):
+        """
+        Check the event's parent domain for wildcards, using the record types we've already resolved.
+
+        This warms up the wildcard cache so the full check in `handle_wildcard_event()` doesn't have to wait on it.
+        """
+        rdtypes = tuple(event.raw_dns_records)
+        event_host = event.host_str
+        if not rdtypes or self.helpers.is_domain(event_host):
+            return
+        parent = self.helpers.parent_domain(event_host)
+        with suppress(DNSError):
+            await self.helpers.dns.is_wildcard_domain(parent, rdtypes=rdtypes)
+
     async def handle_wildcard_event(self, event):
         rdtypes = tuple(event.raw_dns_records)
         wildcard_rdtypes = await self.helpers.is_wildcard(
-            event.host, rdtypes=rdtypes, raw_dns_records=event.raw_dns_records
+            event.host_str, rdtypes=rdtypes, raw_dns_records=event.raw_dns_records
         )
         for rdtype, (is_wildcard, wildcard_host) in wildcard_rdtypes.items():
             if is_wildcard == False:
@@ -134,20 +155,13 @@ class DNSResolve(BaseInterceptModule):
 
         # wildcard event modification (www.evilcorp.com --> _wildcard.evilcorp.com)
         if wildcard_rdtypes and not "target" in event.tags:
-            # these are the rdtypes that have wildcards
-            wildcard_rdtypes_set = set(wildcard_rdtypes)
             # consider the event a full wildcard if all its records are wildcards
-            event_is_wildcard = False
-            if wildcard_rdtypes_set:
-                event_is_wildcard = all(r[0] == True for r in wildcard_rdtypes.values())
+            event_is_wildcard = all(r[0] == True for r in wildcard_rdtypes.values())
 
             if event_is_wildcard:
                 if event.type in ("DNS_NAME",) and not "_wildcard" in event.data.split("."):
-                    wildcard_parent = self.helpers.parent_domain(event.host)
-                    for rdtype, (_is_wildcard, _parent_domain) in wildcard_rdtypes.items():
-                        if _is_wildcard:
-                            wildcard_parent = _parent_domain
-                            break
+                    # every rdtype is a wildcard, so the first one gives us the wildcard parent
+                    _, wildcard_parent = next(iter(wildcard_rdtypes.values()))
                     wildcard_data = f"_wildcard.{wildcard_parent}"
                     if wildcard_data != event.data:
                         self.debug(f'Wildcard detected, changing event.data "{event.data}" --> "{wildcard_data}"')
@@ -229,7 +243,7 @@ class DNSResolve(BaseInterceptModule):
     async def resolve_event(self, event, types):
         if not types:
             return
-        event_host = str(event.host)
+        event_host = event.host_str
         queries = [(event_host, rdtype) for rdtype in types]
         dns_errors = {}
         async for (query, rdtype), (answers, errors) in self.helpers.dns.resolve_raw_batch(queries):
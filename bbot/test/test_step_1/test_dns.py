@@ -49,6 +49,14 @@ async def test_dns_engine(bbot_scanner):
             pass_2 = True
     assert pass_1 and pass_2
 
+    # batches larger than batch_size are split across multiple engine calls
+    scan.helpers.dns.batch_size = 2
+    queries = ["one.one.one.one", "1.1.1.1", "www.evilcorp.com", "one.one.one.one", "1.1.1.1"]
+    results = [_ async for _ in scan.helpers.resolve_batch(queries)]
+    assert sorted(r[0] for r in results) == sorted(queries)
+    assert all(("1.1.1.1" in result) for query, result in results if query == "one.one.one.one")
+    assert not any(result for query, result in results if query == "www.evilcorp.com")
+
     from bbot.core.helpers.dns.mock import MockResolver
 
     # ensure dns records are being properly cleaned
@@ -762,3 +770,171 @@ async def test_dns_helpers(bbot_scanner):
     resolver_file = await scan.helpers.dns.brute.resolver_file()
     resolvers = set(scan.helpers.read_file(resolver_file))
     assert resolvers == {"1.2.3.4", "4.3.2.1"}
+
+    # wildcard_ignore matches the domain and all its subdomains
+    scan = bbot_scanner(config={"dns": {"wildcard_ignore": ["Evilcorp.com.", "ignored.example.org"]}})
+    assert scan.helpers.dns.wildcard_ignore == {"evilcorp.com", "ignored.example.org"}
+    assert scan.helpers.dns._wildcard_prevalidation("evilcorp.com") == False
+    assert scan.helpers.dns._wildcard_prevalidation("www.api.evilcorp.com") == False
+    assert scan.helpers.dns._wildcard_prevalidation("www.ignored.example.org") == False
+    assert scan.helpers.dns._wildcard_prevalidation("notevilcorp.com") == "notevilcorp.com"
+    assert scan.helpers.dns._wildcard_prevalidation("www.example.org") == "www.example.org"
+
+
+@pytest.mark.asyncio
+async def test_dns_resolver():
+    import time
+    import dns.name
+    import dns.rcode
+    import dns.rrset
+    import dns.message
+    import dns.resolver
+    import dns.rdatatype
+    from bbot.core.helpers.dns.resolver import BBOTAsyncResolver
+
+    soa = "ns.evilcorp.com. admin.evilcorp.com. 1 7200 3600 1209600 60"
+
+    # minimal nameserver that answers A queries for one.one.one.one and NXDOMAINs everything else
+    class NameServer(asyncio.DatagramProtocol):
+        def connection_made(self, transport):
+            self.transport = transport
+
+        def datagram_received(self, data, addr):
+            request = dns.message.from_wire(data)
+            response = dns.message.make_response(request)
+            question = request.question[0]
+            if question.name.to_text() == "one.one.one.one.":
+                if question.rdtype == dns.rdatatype.A:
+                    response.answer.append(dns.rrset.from_text(question.name, 60, "IN", "A", "1.1.1.1", "1.0.0.1"))
+                else:
+                    response.authority.append(dns.rrset.from_text("one.one.one.", 60, "IN", "SOA", soa))
+            elif question.name.to_text() == "servfail.evilcorp.com.":
+                response.set_rcode(dns.rcode.SERVFAIL)
+            else:
+                response.set_rcode(dns.rcode.NXDOMAIN)
+                response.authority.append(dns.rrset.from_text("evilcorp.com.", 60, "IN", "SOA", soa))
+            self.transport.sendto(response.to_wire(), addr)
+
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(NameServer, local_addr=("127.0.0.1", 0))
+    port = transport.get_extra_info("sockname")[1]
+    try:
+        resolver = BBOTAsyncResolver(nameservers=["127.0.0.1"], timeout=2, port=port)
+        answer = await resolver.resolve("one.one.one.one", rdtype="A")
+        assert isinstance(answer, dns.resolver.Answer)
+        assert {r.to_text() for r in answer} == {"1.1.1.1", "1.0.0.1"}
+        assert 0 < answer.expiration - time.time() <= 60
+        # answerless responses are parsed only up to the question, so their SOA authority is skipped
+        with pytest.raises(dns.resolver.NoAnswer) as e:
+            await resolver.resolve("one.one.one.one", rdtype="AAAA")
+        response = e.value.kwargs["response"]
+        assert response.question and not response.authority
+        with pytest.raises(dns.resolver.NXDOMAIN) as e:
+            await resolver.resolve("www.evilcorp.com", rdtype="A")
+        response = e.value.responses()[dns.name.from_text("www.evilcorp.com")]
+        assert response.question and not response.authority
+        with pytest.raises(dns.resolver.NoNameservers):
+            await resolver.resolve("servfail.evilcorp.com", rdtype="A")
+
+        # concurrent queries share a small pool of sockets
+        resolver = BBOTAsyncResolver(nameservers=["127.0.0.1"], timeout=2, port=port, udp_sockets=4)
+        answers = await asyncio.gather(*[resolver.resolve("one.one.one.one", rdtype="A") for _ in range(100)])
+        assert all({r.to_text() for r in answer} == {"1.1.1.1", "1.0.0.1"} for answer in answers)
+        assert len(resolver._udp_pool["127.0.0.1"]) == 4
+        resolver.close()
+        assert not resolver._udp_pool
+
+        # two in-flight queries with the same DNS ID can't end up on the same socket
+        resolver = BBOTAsyncResolver(nameservers=["127.0.0.1"], timeout=2, port=port, udp_sockets=1)
+        await resolver.resolve("one.one.one.one", rdtype="A")
+        requests = [dns.message.make_query("one.one.one.one", "A") for _ in range(2)]
+        requests[1].id = requests[0].id
+        # if they shared a socket, one of them would never get its response
+        responses = await asyncio.gather(*[resolver._query_udp(r, "127.0.0.1", timeout=10) for r in requests])
+        assert all(response.id == requests[0].id for response in responses)
+        assert len(resolver._udp_pool["127.0.0.1"]) == 1
+        assert not resolver._udp_pool["127.0.0.1"][0].pending
+        resolver.close()
+
+        # with no pool, every query gets its own socket
+        resolver = BBOTAsyncResolver(nameservers=["127.0.0.1"], timeout=2, port=port, udp_sockets=0)
+        answer = await resolver.resolve("one.one.one.one", rdtype="A")
+        assert {r.to_text() for r in answer} == {"1.1.1.1", "1.0.0.1"}
+        assert not resolver._udp_pool["127.0.0.1"]
+
+        # a nameserver that never answers shouldn't hold up the query
+        # this needs a second loopback address, and only Linux routes all of 127.0.0.0/8 to loopback
+        if sys.platform.startswith("linux"):
+            silent_transport, _ = await loop.create_datagram_endpoint(
+                asyncio.DatagramProtocol, local_addr=("127.0.0.2", port)
+            )
+            try:
+                timeout = 10
+                resolver = BBOTAsyncResolver(
+                    nameservers=["127.0.0.2", "127.0.0.1"], timeout=timeout, port=port, race_delay=0.1
+                )
+                # the starting nameserver is rotated, so this covers both orders
+                for _ in range(2):
+                    start = time.monotonic()
+                    answer = await resolver.resolve("one.one.one.one", rdtype="A")
+                    assert answer.nameserver == "127.0.0.1"
+                    assert time.monotonic() - start < timeout / 2
+                # negative answers are definitive too
+                for _ in range(2):
+                    start = time.monotonic()
+                    with pytest.raises(dns.resolver.NXDOMAIN):
+                        await resolver.resolve("www.evilcorp.com", rdtype="A")
+                    assert time.monotonic() - start < timeout / 2
+            finally:
+                silent_transport.close()
+    finally:
+        transport.close()
+
+
+@pytest.mark.asyncio
+async def test_dns_cache():
+    import time
+    from bbot.core.helpers.dns.engine import DNSEngine
+
+    dnsengine = DNSEngine(None, config={"dns": {"cache_error_ttl": 60}})
+    await dnsengine._mock_dns(mock_records)
+
+    # mock records have a TTL of 1 second
+    assert "1.1.1.1" in await dnsengine.resolve("one.one.one.one")
+    assert hash(("one.one.one.one", "A")) in dnsengine._dns_cache
+    assert 0 < dnsengine._dns_cache.ttl(dnsengine._dns_cache.get(hash(("one.one.one.one", "A")))) <= 1
+    await asyncio.sleep(1.1)
+    assert hash(("one.one.one.one", "A")) not in dnsengine._dns_cache
+
+    # expired answers are still served while they're refreshed in the background
+    assert dnsengine._dns_cache.get_stale(hash(("one.one.one.one", "A"))) is not None
+    assert "1.1.1.1" in await dnsengine.resolve("one.one.one.one")
+    refresh_task = dnsengine._dns_cache_refreshes[hash(("one.one.one.one", "A"))]
+    await refresh_task
+    assert hash(("one.one.one.one", "A")) in dnsengine._dns_cache
+
+    # negative responses are cached for cache_error_ttl
+    assert not await dnsengine.resolve("www.evilcorp.com")
+    assert dnsengine._dns_cache.get(hash(("www.evilcorp.com", "A"))) == []
+
+    # answers are never cached longer than cache_max_ttl
+    dnsengine = DNSEngine(None, config={"dns": {"cache_max_ttl": 0}})
+    await dnsengine._mock_dns(mock_records)
+    assert "1.1.1.1" in await dnsengine.resolve("one.one.one.one")
+    assert hash(("one.one.one.one", "A")) not in dnsengine._dns_cache
+    assert not await dnsengine.resolve("www.evilcorp.com")
+    assert hash(("www.evilcorp.com", "A")) not in dnsengine._dns_cache
+
+    # background refreshes are cancelled on shutdown
+    dnsengine = DNSEngine(None)
+
+    async def slow_resolve(query, **kwargs):
+        await asyncio.sleep(10)
+        return ["1.1.1.1"], []
+
+    dnsengine._dns_cache._cache[hash(("one.one.one.one", "A"))] = (["1.1.1.1"], time.monotonic() - 1)
+    assert dnsengine._get_cached(hash(("one.one.one.one", "A")), slow_resolve, "one.one.one.one") == ["1.1.1.1"]
+    refresh_task = dnsengine._dns_cache_refreshes[hash(("one.one.one.one", "A"))]
+    await dnsengine._shutdown()
+    assert refresh_task.cancelled()
+    assert not dnsengine._dns_cache_refreshes
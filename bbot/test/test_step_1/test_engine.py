@@ -146,3 +146,87 @@ async def test_engine():
     assert return_errored == True
 
     await test_engine.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_engine_codec():
+    from bbot.core.engine import EngineClient, EngineServer
+
+    commands = []
+
+    # a codec that plain pickle can't read
+    class Codec:
+        def pickle(self, obj):
+            return b"bbot" + super().pickle(obj)
+
+        def unpickle(self, binary):
+            assert binary.startswith(b"bbot")
+            message = super().unpickle(binary[4:])
+            if isinstance(message, dict) and "c" in message:
+                commands.append(message["c"])
+            return message
+
+    class TestEngineServer(Codec, EngineServer):
+
+        CMDS = {
+            0: "yield_stuff",
+        }
+
+        async def yield_stuff(self):
+            while 1:
+                yield "thing"
+                await asyncio.sleep(0.1)
+
+    class TestEngineClient(Codec, EngineClient):
+
+        SERVER_CLASS = TestEngineServer
+
+    test_engine = TestEngineClient()
+
+    # cancel and shutdown messages go through the same codec as everything else
+    agen = test_engine.run_and_yield("yield_stuff")
+    async for r in agen:
+        assert r == "thing"
+        await agen.aclose()
+        break
+    assert commands == [0, -1]
+    await test_engine.shutdown()
+    assert commands == [0, -1, -99]
+
+
+def test_engine_uvloop(monkeypatch):
+    import sys
+    import types
+    from bbot.core.engine import EngineClient, EngineServer
+
+    runs = []
+
+    def fake_run(name):
+        def run(coro):
+            coro.close()
+            runs.append(name)
+
+        return run
+
+    monkeypatch.setitem(sys.modules, "uvloop", types.SimpleNamespace(run=fake_run("uvloop")))
+    monkeypatch.setattr(asyncio, "run", fake_run("asyncio"))
+
+    class TestEngineServer(EngineServer):
+        UVLOOP = True
+
+    class TestEngineServerNoUvloop(EngineServer):
+        pass
+
+    EngineClient.server_process(TestEngineServer, None)
+    EngineClient.server_process(TestEngineServerNoUvloop, None)
+    assert runs == ["uvloop", "asyncio"]
+
+    # fall back to asyncio if uvloop isn't installed
+    monkeypatch.setitem(sys.modules, "uvloop", None)
+    EngineClient.server_process(TestEngineServer, None)
+    assert runs == ["uvloop", "asyncio", "asyncio"]
+
+    # the DNS engine runs on uvloop
+    from bbot.core.helpers.dns.engine import DNSEngine
+
+    assert DNSEngine.UVLOOP == True
@@ -561,10 +561,19 @@ async def test_events(events, helpers):
     # test host backup
     host_event = scan.make_event("asdf.evilcorp.com", "DNS_NAME", parent=scan.root_event)
     assert host_event.host_original == "asdf.evilcorp.com"
+    assert host_event.host_str == "asdf.evilcorp.com"
     host_event.host = "_wildcard.evilcorp.com"
     assert host_event.host == "_wildcard.evilcorp.com"
+    assert host_event.host_str == "_wildcard.evilcorp.com"
     assert host_event.host_original == "asdf.evilcorp.com"
 
+    # host_str follows changes to the event's data
+    ip_event = scan.make_event("127.0.0.1", parent=scan.root_event)
+    assert ip_event.host == ipaddress.ip_address("127.0.0.1")
+    assert ip_event.host_str == "127.0.0.1"
+    ip_event.data = "127.0.0.2"
+    assert ip_event.host_str == "127.0.0.2"
+
     # test storage bucket validation
     bucket_event = scan.make_event(
         {"name": "ASDF.s3.amazonaws.com", "url": "https://ASDF.s3.amazonaws.com"},
@@ -111,6 +111,15 @@ async def test_helpers_misc(helpers, scan, bbot_scanner, bbot_httpserver):
     assert not helpers.is_dns_name("dead::beef")
     assert not helpers.is_dns_name("bob@evilcorp.com")
 
+    # host checks on strings are cached, everything else passes straight through
+    hits = helpers.is_ip.cache_info().hits
+    assert helpers.is_ip("127.0.0.1")
+    assert helpers.is_ip("127.0.0.1")
+    assert helpers.is_ip.cache_info().hits > hits
+    assert not helpers.is_ip("127.0.0.1", version=6)
+    assert not helpers.is_ip(["127.0.0.1"])
+    assert helpers.clean_dns_record("WWW.EVILCORP.COM.") == "www.evilcorp.com"
+
     assert helpers.domain_stem("evilcorp.co.uk") == "evilcorp"
     assert helpers.domain_stem("www.evilcorp.co.uk") == "www.evilcorp"
 
@@ -786,6 +795,61 @@ async def test_async_helpers():
     assert len(results) == 1000
     assert sorted(random_ints) == sorted(results)
 
+    # concurrent calls to a cached method are coalesced into one
+    from cachetools import LRUCache
+    from bbot.core.helpers.async_helpers import async_cachedmethod
+
+    class Cached:
+        def __init__(self):
+            self.cache = LRUCache(maxsize=10)
+            self.calls = []
+
+        @async_cachedmethod(lambda self: self.cache)
+        async def double(self, n):
+            self.calls.append(n)
+            await asyncio.sleep(0.1)
+            if n < 0:
+                raise ValueError("negative")
+            return n * 2
+
+    cached = Cached()
+    assert await asyncio.gather(*[cached.double(2) for _ in range(10)]) == [4] * 10
+    assert cached.calls == [2]
+    assert await cached.double(2) == 4
+    assert cached.calls == [2]
+    # errors are shared by the coalesced calls, and aren't cached
+    results = await asyncio.gather(*[cached.double(-1) for _ in range(5)], return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+    assert cached.calls == [2, -1]
+    with pytest.raises(ValueError):
+        await cached.double(-1)
+    assert cached.calls == [2, -1, -1]
+    # a cancelled call doesn't take its waiters down with it
+    task1 = asyncio.create_task(cached.double(3))
+    await asyncio.sleep(0.01)
+    task2 = asyncio.create_task(cached.double(3))
+    await asyncio.sleep(0.01)
+    task1.cancel()
+    assert await task2 == 6
+    assert cached.calls == [2, -1, -1, 3, 3]
+
+    # named locks
+    from bbot.core.helpers.async_helpers import NamedLock
+
+    named_lock = NamedLock(max_size=1)
+    running = []
+
+    async def hold_lock(name):
+        async with named_lock.lock(name):
+            running.append(name)
+            assert running.count(name) == 1
+            await asyncio.sleep(0.01)
+            running.remove(name)
+
+    # a held lock can't be evicted and replaced, even when the LRU is full
+    await asyncio.gather(*[hold_lock(f"{i % 10}.evilcorp.com") for i in range(100)])
+    assert not named_lock._active
+
 
 def test_portparse(helpers):
     assert helpers.parse_port_string("80,443,22") == [80, 443, 22]